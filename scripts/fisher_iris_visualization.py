@@ -2,26 +2,61 @@ import bpy
 import bmesh
 import numpy as np
 import utils
-from mathutils import Vector, Matrix
+from mathutils import Vector
 from math import pi
 import os
 
+try:
+    # Compute only the selected eigenpairs if scipy is available
+    from scipy.linalg import eigh as sp_eigh
+except ImportError:
+    sp_eigh = None
+
+
 def PCA(data, num_components=None):
-    # Mean center the data
-    data -= data.mean(axis=0)
-    # Calculate the covariance matrix
-    R = np.cov(data, rowvar=False)
-    # Calculate eigenvectors & eigenvalues of the covariance matrix
-    V, E = np.linalg.eigh(R)
-    # Sort eigenvalue in decreasing order
-    idx = np.argsort(V)[::-1]
-    E = E[:, idx]
-    # Sort eigenvectors according to the same index
-    V = V[idx]
-    # Select the first n eigenvectors
-    E = E[:, :num_components]
-    # Transform the data using eigenvectors
-    return np.dot(E.T, data.T).T, V, E
+    # Returns the projected data, the eigenvalues and the eigenvectors of
+    # the first num_components components in decreasing order
+    # Mean center the data, the passed data is not modified
+    mean = data.mean(axis=0)
+    Xc = data - mean
+    n, d = Xc.shape
+    # At most d components exist
+    k = d if num_components is None else min(num_components, d)
+
+    # For tall data the covariance matrix is small, calculate it directly
+    # from the Gram matrix of the centered data and compute only the
+    # selected eigenpairs. The thin SVD has only min(n, d) components, so
+    # more components than samples also need the covariance matrix
+    if (n > d and k < d) or k > n:
+        R = (Xc.T @ Xc) / (n - 1)
+        # Calculate eigenvectors & eigenvalues of the covariance matrix
+        if sp_eigh is not None:
+            # Only the k largest eigenpairs are computed
+            V, E = sp_eigh(R, subset_by_index=[d - k, d - 1])
+        else:
+            V, E = np.linalg.eigh(R)
+            # Select the last k eigenpairs with the largest eigenvalues
+            V = V[d - k:]
+            E = E[:, d - k:]
+        # Sort eigenvalues and eigenvectors in decreasing order
+        V = V[::-1]
+        E = E[:, ::-1]
+        # Transform the data using eigenvectors
+        return Xc @ E, V, E
+
+    # Calculate the singular value decomposition of the centered data,
+    # which avoids building the covariance matrix
+    U, S, VT = np.linalg.svd(Xc, full_matrices=False)
+    # Singular values are sorted in decreasing order and relate to the
+    # eigenvalues of the covariance matrix by V = S^2 / (n - 1)
+    V = S**2 / (n - 1)
+    # Transform the data, U * S is equal to the projection Xc @ E
+    if k == len(S):
+        # Keep all components without slicing
+        return U * S, V, VT.T
+    # Select the first k right singular vectors as eigenvectors
+    E = VT[:k].T
+    return U[:, :k] * S[:k], V[:k], E
 
 
 def load_iris():
@@ -36,23 +71,21 @@ def load_iris():
         y = iris.target
         labels = iris.target_names
 
-        # Reduce components by Principal Component Analysis
-        X = decomposition.PCA(n_components=3).fit_transform(X)
+        # Reduce components by Principal Component Analysis, the full SVD
+        # is the fastest solver for the small Iris data matrix
+        X = decomposition.PCA(n_components=3, svd_solver='full').fit_transform(X)
     except ImportError:
         # Load Iris dataset manually
         path = os.path.join('data', 'iris', 'iris.data')
-        iris_data = np.genfromtxt(path, dtype='str', delimiter=',')
-        X = iris_data[:, :4].astype(dtype=float)
-        y = np.ndarray((X.shape[0],), dtype=int)
-
-        # Create target vector y and corresponding labels
-        labels, idx = [], 0
-        for i, label in enumerate(iris_data[:, 4]):
-            label = label.split('-')[1]
-            if label not in labels:
-                labels.append(label)
-                idx += 1
-            y[i] = idx - 1
+        iris_data = np.genfromtxt(path, delimiter=',', dtype=None, encoding=None,
+                                  names=['a', 'b', 'c', 'd', 'label'])
+        X = np.stack([iris_data[k] for k in 'abcd'], axis=1).astype(float)
+
+        # Create target vector y and corresponding labels from the
+        # species names without the 'Iris-' prefix
+        species = np.char.partition(iris_data['label'], '-')[:, 2]
+        labels, y = np.unique(species, return_inverse=True)
+        labels = labels.tolist()
 
         # Reduce components by implemented Principal Component Analysis
         X = PCA(X, 3)[0]
@@ -60,79 +93,214 @@ def load_iris():
     return X, y, labels
 
 
+def sort_by_label(X, y, num_labels):
+    # Sort the points by label, the points of label k are then
+    # X_sorted[boundaries[k]:boundaries[k + 1]]
+    order = np.argsort(y, kind='stable')
+    boundaries = np.searchsorted(y[order], np.arange(num_labels + 1))
+    return X[order], boundaries
+
+
+def create_prototype(label_idx, size=0.25):
+    # Create the shape primitive of a class once at the origin
+    bm = bmesh.new()
+    if label_idx % 3 == 0:
+        bmesh.ops.create_cube(bm, size=size)
+    elif label_idx % 3 == 1:
+        bmesh.ops.create_icosphere(bm, subdivisions=2, radius=size / 2)
+    else:
+        bmesh.ops.create_cone(bm, segments=6, cap_ends=True, radius1=size / 2, radius2=0, depth=size)
+
+    # Read vertices, face corners and face sizes directly from the bmesh
+    # without converting it to a temporary mesh
+    bm.verts.index_update()
+    verts = np.array([v.co for v in bm.verts], dtype=np.float32)
+    loops = np.array([v.index for f in bm.faces for v in f.verts], dtype=np.int32)
+    loop_totals = np.array([len(f.verts) for f in bm.faces], dtype=np.int32)
+    bm.free()
+
+    return verts, loops, loop_totals
+
+
+def create_mesh(name, verts, loops, loop_totals):
+    # Create a mesh directly from the vertex and face arrays
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(verts))
+    mesh.vertices.foreach_set('co', verts.ravel())
+    mesh.loops.add(len(loops))
+    mesh.loops.foreach_set('vertex_index', loops)
+    mesh.polygons.add(len(loop_totals))
+    mesh.polygons.foreach_set('loop_start', np.cumsum(loop_totals, dtype=np.int32) - loop_totals)
+    # Face sizes are derived from the loop starts since Blender 4.0
+    if bpy.app.version < (4, 0, 0):
+        mesh.polygons.foreach_set('loop_total', loop_totals)
+    mesh.update(calc_edges=True)
+    return mesh
+
+
+def replicate_prototype(prototype, points, vert_offset=0):
+    # Copy the primitive to each point and offset the face corners
+    # by the number of vertices of the preceding copies
+    verts, loops, loop_totals = prototype
+    offsets = (vert_offset + np.arange(len(points)) * len(verts)).astype(np.int32)
+    return ((verts[None, :, :] + points[:, None, :]).reshape(-1, 3),
+            (loops[None, :] + offsets[:, None]).ravel(),
+            np.tile(loop_totals, len(points)))
+
+
+def create_scatter_material(label_idx, color):
+    # Create a material for each class
+    mat = bpy.data.materials.new(f'ScatterMaterial {label_idx}')
+    mat.diffuse_color = color
+    mat.specular_intensity = 0.0
+    return mat
+
+
+def create_instancing_group(prototypes):
+    # Create a geometry nodes group which instances one of the prototype
+    # objects on each vertex, picked by the 'class' point attribute
+    group = bpy.data.node_groups.new('ScatterInstances', 'GeometryNodeTree')
+    if hasattr(group, 'interface'):
+        # Blender 4.0+
+        group.interface.new_socket('Geometry', in_out='INPUT', socket_type='NodeSocketGeometry')
+        group.interface.new_socket('Geometry', in_out='OUTPUT', socket_type='NodeSocketGeometry')
+    else:
+        group.inputs.new('NodeSocketGeometry', 'Geometry')
+        group.outputs.new('NodeSocketGeometry', 'Geometry')
+
+    group_input = group.nodes.new('NodeGroupInput')
+    group_output = group.nodes.new('NodeGroupOutput')
+
+    # One instance for each prototype in the collection, in name order
+    collection_info = group.nodes.new('GeometryNodeCollectionInfo')
+    collection_info.inputs['Collection'].default_value = prototypes
+    collection_info.inputs['Separate Children'].default_value = True
+    collection_info.inputs['Reset Children'].default_value = True
+
+    named_attribute = group.nodes.new('GeometryNodeInputNamedAttribute')
+    named_attribute.data_type = 'INT'
+    named_attribute.inputs['Name'].default_value = 'class'
+    # Before Blender 4.0 there is one output for each data type
+    class_output = next(socket for socket in named_attribute.outputs if socket.enabled)
+
+    instance_on_points = group.nodes.new('GeometryNodeInstanceOnPoints')
+    instance_on_points.inputs['Pick Instance'].default_value = True
+
+    group.links.new(group_input.outputs['Geometry'], instance_on_points.inputs['Points'])
+    group.links.new(collection_info.outputs[0], instance_on_points.inputs['Instance'])
+    group.links.new(class_output, instance_on_points.inputs['Instance Index'])
+    group.links.new(instance_on_points.outputs['Instances'], group_output.inputs['Geometry'])
+
+    return group
+
+
+def create_scatter_instances(X_sorted, boundaries, classes, size=0.25):
+    # Collect the prototype object of each class in a collection, which is
+    # not linked to the scene and only referenced by the instancing nodes
+    prototypes = bpy.data.collections.new('ScatterPrototypes')
+    for label_idx, color in classes:
+        mesh = create_mesh(f'ScatterPrototypeMesh {label_idx}', *create_prototype(label_idx, size))
+        mesh.materials.append(create_scatter_material(label_idx, color))
+        prototypes.objects.link(bpy.data.objects.new(f'ScatterPrototype {label_idx}', mesh))
+
+    # Create a mesh which only stores the points and the class of each point
+    num_points = boundaries[len(classes)]
+    points = X_sorted[:num_points].astype(np.float32)
+    class_indices = np.repeat(np.arange(len(classes), dtype=np.int32), np.diff(boundaries)[:len(classes)])
+    mesh = bpy.data.meshes.new('ScatterMesh')
+    mesh.vertices.add(num_points)
+    mesh.vertices.foreach_set('co', points.ravel())
+    mesh.attributes.new('class', 'INT', 'POINT').data.foreach_set('value', class_indices)
+    mesh.update()
+
+    # Create an object with the points and link it to the scene
+    obj = bpy.data.objects.new('ScatterObject', mesh)
+    bpy.context.collection.objects.link(obj)
+
+    # Instance the prototypes on the points when evaluating the object
+    modifier = obj.modifiers.new('Instances', 'NODES')
+    modifier.node_group = create_instancing_group(prototypes)
+
+    return obj
+
+
+def create_scatter_mesh(X_sorted, boundaries, classes, size=0.25):
+    counts = np.diff(boundaries)[:len(classes)]
+
+    # Create the shape primitive of each class and find where the
+    # vertices of each class start in the merged mesh
+    prototypes = [create_prototype(label_idx, size) for label_idx, _ in classes]
+    verts_per_class = counts * [len(verts) for verts, _, _ in prototypes]
+    vert_offsets = np.cumsum(verts_per_class) - verts_per_class
+
+    # Collect the geometry of all classes into a single mesh
+    parts = [replicate_prototype(prototype, X_sorted[boundaries[label_idx]:boundaries[label_idx + 1]].astype(np.float32), offset)
+             for (label_idx, _), prototype, offset in zip(classes, prototypes, vert_offsets)]
+    verts, loops, loop_totals = (np.concatenate(arrays) for arrays in zip(*parts))
+    mesh = create_mesh('ScatterMesh', verts, loops, loop_totals)
+
+    # Assign the material of each class to its faces, which are stored
+    # consecutively for each class
+    materials = [create_scatter_material(label_idx, color) for label_idx, color in classes]
+    for mat in materials:
+        mesh.materials.append(mat)
+    faces_per_class = counts * [len(loop_totals) for _, _, loop_totals in prototypes]
+    material_indices = np.repeat(np.arange(len(materials), dtype=np.int32), faces_per_class)
+    mesh.polygons.foreach_set('material_index', material_indices)
+
+    # Create an object with the mesh and link it to the scene
+    obj = bpy.data.objects.new('ScatterObject', mesh)
+    bpy.context.collection.objects.link(obj)
+
+    return obj
+
+
 def create_scatter(X, y, size=0.25):
-    label_indices = set(y)
+    label_indices = range(int(y.max()) + 1)
     colors = [(1, 0, 0, 1), (0, 1, 0, 1), (0, 0, 1, 1), (1, 1, 0, 1), (1, 0, 1, 1), (0, 1, 1, 1)]
+    classes = list(zip(label_indices, colors))
 
-    # Create a bmesh for each label
-    bm_list = [bmesh.new() for _ in label_indices]
+    X_sorted, boundaries = sort_by_label(X, y, len(label_indices))
 
-    # Iterate through all the vectors and targets
-    for x, label_idx in zip(X, y):
-        # Use the vector as translation for each point
-        T = Matrix.Translation(x)
+    if bpy.app.version >= (3, 2, 0):
+        # Store each primitive once and instance it on the points
+        return create_scatter_instances(X_sorted, boundaries, classes, size)
+    # Instancing by a named attribute is not available, copy the primitives
+    return create_scatter_mesh(X_sorted, boundaries, classes, size)
 
-        if label_idx % 3 == 0:
-            bmesh.ops.create_cube(bm_list[label_idx], size=size, matrix=T)
-        elif label_idx % 3 == 1:
-            bmesh.ops.create_icosphere(bm_list[label_idx], subdivisions=2, radius=size / 2, matrix=T)
-        else:
-            bmesh.ops.create_cone(bm_list[label_idx], segments=6, cap_ends=True, radius1=size / 2, radius2=0, depth=size, matrix=T)
-
-    objects = []
-    for label_idx, color in zip(label_indices, colors):
-        # Create a mesh from the existing bmesh
-        mesh = bpy.data.meshes.new(f'ScatterMesh {label_idx}')
-        bm_list[label_idx].to_mesh(mesh)
-        bm_list[label_idx].free()
 
-        # Create an object with the mesh and link it to the scene
-        obj = bpy.data.objects.new(f'ScatterObject {label_idx}', mesh)
-        bpy.context.collection.objects.link(obj)
+def create_label(label, center, camera=None):
+    font_curve = bpy.data.curves.new(type="FONT", name=label)
+    font_curve.body = label
+    font_curve.align_x = 'CENTER'
+    font_curve.align_y = 'BOTTOM'
+    font_curve.size = 0.6
 
-        # Create materials for each bmesh
-        mat = bpy.data.materials.new(f'ScatterMaterial {label_idx}')
-        mat.diffuse_color = color
-        mat.specular_intensity = 0.0
-        obj.data.materials.append(mat)
+    obj = bpy.data.objects.new(f"Label {label}", font_curve)
+    obj.location = center + Vector((0, 0, 0.8))
+    obj.rotation_mode = 'AXIS_ANGLE'
+    obj.rotation_axis_angle = (pi / 2, 1, 0, 0)
+    bpy.context.collection.objects.link(obj)
 
-        objects.append(obj)
+    if camera is not None:
+        constraint = obj.constraints.new('LOCKED_TRACK')
+        constraint.target = camera
+        constraint.track_axis = 'TRACK_Z'
+        constraint.lock_axis = 'LOCK_Y'
 
-    return objects
+    return obj
 
 
 def create_labels(X, y, labels, camera=None):
-    label_indices = set(y)
-    objects = []
-
-    # Draw labels
-    for label_idx in label_indices:
-        center = np.sum([x for x, idx in zip(X, y) if idx == label_idx], axis=0)
-        counts = (y == label_idx).sum()
-        center = Vector(center) / counts
-
-        label = labels[label_idx]
-        font_curve = bpy.data.curves.new(type="FONT", name=label)
-        font_curve.body = label
-        font_curve.align_x = 'CENTER'
-        font_curve.align_y = 'BOTTOM'
-        font_curve.size = 0.6
-
-        obj = bpy.data.objects.new(f"Label {label}", font_curve)
-        obj.location = center + Vector((0, 0, 0.8))
-        obj.rotation_mode = 'AXIS_ANGLE'
-        obj.rotation_axis_angle = (pi / 2, 1, 0, 0)
-        bpy.context.collection.objects.link(obj)
-
-        if camera is not None:
-            constraint = obj.constraints.new('LOCKED_TRACK')
-            constraint.target = camera
-            constraint.track_axis = 'TRACK_Z'
-            constraint.lock_axis = 'LOCK_Y'
+    label_indices = range(int(y.max()) + 1)
 
-        objects.append(obj)
+    X_sorted, boundaries = sort_by_label(X, y, len(label_indices))
 
-    return objects
+    # Draw labels at the center of each class
+    return [create_label(labels[label_idx],
+                         Vector(X_sorted[boundaries[label_idx]:boundaries[label_idx + 1]].mean(axis=0)),
+                         camera)
+            for label_idx in label_indices]
 
 
 if __name__ == '__main__':
@@ -157,9 +325,7 @@ if __name__ == '__main__':
     target.keyframe_insert(data_path='rotation_axis_angle', index=-1, frame=bpy.context.scene.frame_end + 1)
 
     # Change each created keyframe point to linear interpolation
-    for fcurve in target.animation_data.action.fcurves:
-        for keyframe in fcurve.keyframe_points:
-            keyframe.interpolation = 'LINEAR'
+    utils.set_linear_interpolation(target)
 
     X, y, labels = load_iris()
     create_scatter(X, y)
@@ -128,7 +128,7 @@ if __name__ == '__main__':
     # Select colors
     palette = [(3, 101, 100), (205, 179, 128)]
     # Convert color and apply gamma correction
-    palette = [tuple(pow(float(c) / 255, 2.2) for c in color) for color in palette]
+    palette = utils.colorRGB_256_batch(palette)
 
     # Smooth surface and add subsurf modifier
     utils.set_smooth(flower.obj, 2)
@@ -35,9 +35,7 @@ if __name__ == '__main__':
         empty.keyframe_insert(data_path="location", index=-1, frame=frame)
 
     # Change each created keyframe point to linear interpolation
-    for fcurve in empty.animation_data.action.fcurves:
-        for keyframe in fcurve.keyframe_points:
-            keyframe.interpolation = 'LINEAR'
+    utils.set_linear_interpolation(empty)
 
     # Apply subsurf modifier
     subsurf = obj.modifiers.new('Subsurf', 'SUBSURF')
@@ -61,8 +59,7 @@ if __name__ == '__main__':
     # Use some colors
     palette = [(131, 175, 155, 255), (250, 105, 10, 255)]
     # Convert color and apply gamma correction
-    palette = [tuple(pow(float(c) / 255.0, 2.2) for c in color)
-               for color in palette]
+    palette = utils.colorRGB_256_batch(palette)
 
     # Set background color of scene
     bpy.context.scene.world.use_nodes = False
@@ -63,7 +63,7 @@ if __name__ == '__main__':
 
     # Select colors
     palette = [(181, 221, 201, 255), (218, 122, 61, 255)]
-    palette = [utils.colorRGB_256(color) for color in palette]  # Adjust color to Blender
+    palette = utils.colorRGB_256_batch(palette)  # Adjust color to Blender
 
     # Set background color of scene
     bpy.context.scene.world.use_nodes = True
@@ -1,7 +1,7 @@
 import bpy
 import bmesh
-from math import sin, cos, pi
-import colorsys
+import numpy as np
+from math import pi
 import os
 
 TAU = 2 * pi
@@ -104,11 +104,13 @@ def create_light(origin, type='POINT', energy=1, color=(1, 1, 1), target=None):
     Returns:
     bpy.types.Object: The created light object.
     """
-    bpy.ops.object.add(type='LIGHT', location=origin)
-    obj = bpy.context.object
-    obj.data.type = type
-    obj.data.energy = energy
-    obj.data.color = color
+    light = bpy.data.lights.new('Light', type=type)
+    light.energy = energy
+    light.color = color
+
+    obj = bpy.data.objects.new('Light', light)
+    obj.location = origin
+    bpy.context.collection.objects.link(obj)
 
     if target:
         track_to_constraint(obj, target)
@@ -150,6 +152,42 @@ def set_smooth(obj, level=None, smooth=True):
     for p in mesh.polygons:
         p.use_smooth = smooth
 
+def set_linear_interpolation(obj):
+    """
+    Change all keyframe points of an animated object to linear interpolation.
+
+    Parameters:
+    obj (bpy.types.Object): The animated object.
+    """
+    linear = bpy.types.Keyframe.bl_rna.properties['interpolation'].enum_items['LINEAR'].value
+    for fcurve in obj.animation_data.action.fcurves:
+        num_keyframes = len(fcurve.keyframe_points)
+        fcurve.keyframe_points.foreach_set('interpolation', np.full(num_keyframes, linear, dtype=np.int32))
+
+def hsv_to_rgb(h, s, v):
+    """
+    Convert HSV colors to RGB colors, vectorized version of colorsys.hsv_to_rgb.
+
+    Parameters:
+    h (numpy.ndarray): The hues in 0-1 range.
+    s (float or numpy.ndarray): The saturations in 0-1 range.
+    v (float or numpy.ndarray): The values in 0-1 range.
+
+    Returns:
+    numpy.ndarray: The RGB colors as an (N, 3) array.
+    """
+    h, s, v = np.broadcast_arrays(np.asarray(h, dtype=float), s, v)
+    i = np.floor(h * 6.0)
+    f = h * 6.0 - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    sector = [i % 6 == k for k in range(6)]
+    r = np.select(sector, [v, q, p, p, t, v])
+    g = np.select(sector, [t, v, v, q, p, p])
+    b = np.select(sector, [p, p, t, v, v, q])
+    return np.stack([r, g, b], axis=-1)
+
 def rainbow_lights(r=5, n=100, freq=2, energy=0.1):
     """
     Create a series of point lights arranged in a rainbow pattern.
@@ -159,33 +197,34 @@ def rainbow_lights(r=5, n=100, freq=2, energy=0.1):
     n (int): The number of lights.
     freq (float): The frequency of the sine wave.
     energy (float): The energy of the lights.
-    """
-    for i in range(n):
-        t = float(i) / float(n)
-        pos = (r * sin(TAU * t), r * cos(TAU * t), r * sin(freq * TAU * t))
 
-        bpy.ops.object.add(type='LIGHT', location=pos)
-        obj = bpy.context.object
-        obj.data.type = 'POINT'
+    Returns:
+    list: The created light objects.
+    """
+    t = np.arange(n) / n
+    positions = np.stack([r * np.sin(TAU * t), r * np.cos(TAU * t), r * np.sin(freq * TAU * t)], axis=-1)
+    colors = hsv_to_rgb(t, 0.6, 1) ** 2.2
 
-        color = tuple(pow(c, 2.2) for c in colorsys.hsv_to_rgb(t, 0.6, 1))
-        obj.data.color = color
-        obj.data.energy = energy
+    return [create_light(pos, 'POINT', energy, color) for pos, color in zip(positions, colors)]
 
 def remove_all(type=None):
     """
     Remove all objects of a specified type or all objects in the scene.
 
+    Only objects of the current scene are removed. When all objects are
+    removed, every data-block left without users in the file is purged
+    as well (Blender 3.0+).
+
     Parameters:
     type (str, optional): The type of objects to remove.
     """
-    if type:
-        bpy.ops.object.select_all(action='DESELECT')
-        bpy.ops.object.select_by_type(type=type)
-        bpy.ops.object.delete()
-    else:
-        bpy.ops.object.select_all(action="SELECT")
-        bpy.ops.object.delete(use_global=False)
+    for obj in list(bpy.context.scene.objects):
+        if type is None or obj.type == type:
+            bpy.data.objects.remove(obj, do_unlink=True)
+
+    # Remove meshes, materials and other data left without users
+    if type is None and hasattr(bpy.data, 'orphans_purge'):
+        bpy.data.orphans_purge(do_recursive=True)
 
 def create_material(base_color=(1, 1, 1, 1), metalic=0.0, roughness=0.5):
     """
@@ -223,7 +262,20 @@ def colorRGB_256(color):
     Returns:
     tuple: The RGB color in 0-1 range with gamma correction.
     """
-    return tuple(pow(float(c) / 255.0, 2.2) for c in color)
+    arr = np.asarray(color, dtype=np.float64) / 255.0
+    return tuple((arr ** 2.2).tolist())
+
+def colorRGB_256_batch(colors):
+    """
+    Convert a palette of RGB colors from 0-255 range to 0-1 range with gamma correction.
+
+    Parameters:
+    colors (list or numpy.ndarray): The (N, 3) RGB colors in 0-255 range.
+
+    Returns:
+    numpy.ndarray: The (N, 3) RGB colors in 0-1 range with gamma correction.
+    """
+    return (np.asarray(colors, dtype=np.float64) / 255.0) ** 2.2
 
 def render(
     render_folder='rendering',
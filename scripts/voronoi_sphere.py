@@ -73,7 +73,7 @@ if __name__ == '__main__':
     # http://www.colourlovers.com/palette/1189317/Rock_Mint_Splash
     palette = [(89, 91, 90), (20, 195, 162), (13, 229, 168),
                (124, 244, 154), (184, 253, 153)]
-    palette = [utils.colorRGB_256(color) for color in palette]
+    palette = utils.colorRGB_256_batch(palette)
 
     # Set background color of scene
     bpy.context.scene.world.use_nodes = False